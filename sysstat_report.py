@@ -3,29 +3,57 @@
 """Generate and send a sysstat mail report."""
 
 import argparse
+import base64
 import bz2
 import calendar
+import concurrent.futures
 import contextlib
 import datetime
+import email.encoders
+import email.generator
 import email.mime.image
 import email.mime.multipart
 import email.mime.text
 import email.utils
 import enum
+import functools
 import gzip
-import inspect
+import hashlib
+import importlib.util
 import itertools
 import logging
 import lzma
-import operator
+import mmap
+import multiprocessing
 import os
+import pathlib
 import re
 import shlex
 import shutil
+import smtplib
+import struct
 import subprocess
+import sys
 import tempfile
+import threading
 import time
-from typing import IO, Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+# optional, allows minifying SVG without spawning a scour process for each file
+# (only imported when minifying, because it is slow to import and most reports use PNG)
+HAS_SCOUR_MODULE = importlib.util.find_spec("scour") is not None
 
 try:
     # Python >= 3.8
@@ -33,6 +61,8 @@ try:
 except AttributeError:
     cmd_to_string = subprocess.list2cmdline
 
+logger = logging.getLogger(__name__)
+
 ReportType = enum.Enum("ReportType", ("DAILY", "WEEKLY", "MONTHLY"))
 SysstatDataType = enum.Enum(
     "SysstatDataType",
@@ -42,165 +72,291 @@ GraphFormat = enum.Enum("GraphFormat", ("TXT", "PNG", "SVG"))
 
 HAS_OPTIPNG = shutil.which("optipng") is not None
 HAS_OXIPNG = shutil.which("oxipng") is not None
+HAS_SCOUR = shutil.which("scour") is not None
+SCOUR_ARGS = (
+    "-q",
+    "--enable-id-stripping",
+    "--enable-comment-stripping",
+    "--shorten-ids",
+    "--no-line-breaks",
+    "--remove-descriptive-elements",
+)
+# scour keeps some global state while processing a file
+SCOUR_MODULE_LOCK = threading.Lock()
+
+# compressed file extension -> (external decompression commands by order of preference, Python fallback)
+DECOMPRESSORS: Dict[str, Tuple[Tuple[Tuple[str, ...], ...], Callable[..., Any]]] = {
+    ".gz": ((("pigz", "-dc"), ("gzip", "-dc")), gzip.open),
+    ".bz2": ((("pbzip2", "-dc"), ("bzip2", "-dc")), bz2.open),
+    ".xz": ((("xz", "-dc", "-T0"),), lzma.open),
+}
+
+# glibc struct utmp layout with 32-bit time fields (x86_64 and 32-bit platforms), see utmp(5)
+UTMP_RECORD = struct.Struct("hi32s4s32s256shhiii4i20s")
+UTMP_BOOT_TIME = 2
+UTMP_TYPE_MAX = 9
+
+GNUPLOT_TERMINALS = {
+    GraphFormat.TXT: "set terminal dumb 110,25",
+    GraphFormat.PNG: "set terminal png size {width},{height} font 'Liberation,9' noenhanced",
+    GraphFormat.SVG: "set terminal svg size {width},{height} font 'Liberation,9' noenhanced",
+}
+GNUPLOT_X_FORMATS = {
+    ReportType.DAILY: "%R",
+    ReportType.WEEKLY: r"%a %d/%m",
+    ReportType.MONTHLY: r"%d",
+}
+
+# gnuplot code independent of the graph being plotted
+GNUPLOT_COMMON_CODE_LINES = (
+    r"set timefmt '%s'",
+    "set datafile separator ';'",
+    "set key outside right samplen 3 spacing 1.75 width 2",
+    "set xdata time",
+    "set xlabel 'Time'",
+)
+
+IO_BUFFER_SIZE = 1024 * 1024
+
+GRAPH_CACHE_MAX_SIZE = 200 * 1024 * 1024
+GRAPH_CACHE_TMP_MAX_AGE = 60 * 60
+
+SVG_TITLE_REGEX = re.compile(rb"<title\b[^>]*>.*?</title>", re.DOTALL)
+SVG_INTER_TAG_WHITESPACE_REGEX = re.compile(rb">\s+<")
+
+
+def read_kernel_file(filepath: str) -> bytes:
+    """Read a small procfs/sysfs file with a single unbuffered read."""
+    fd = os.open(filepath, os.O_RDONLY)
+    try:
+        return os.read(fd, 8192)
+    finally:
+        os.close(fd)
 
 
 def get_total_memory_mb() -> int:
     """Return total amount of system RAM in MB."""
-    with open("/proc/meminfo", "rt") as f:
-        total_line = next(
-            itertools.dropwhile(lambda x: not x.startswith("MemTotal:"), f)
-        )
-    total_mem = (
-        int(tuple(filter(None, map(str.strip, total_line.split(" "))))[1]) // 1024
-    )
-    logging.getLogger().info(f"Total amount of memory: {total_mem} MB")
+    data = read_kernel_file("/proc/meminfo")
+    start = data.find(b"MemTotal:")
+    if start == -1:
+        raise RuntimeError("Unable to find MemTotal in /proc/meminfo")
+    total_mem = int(data[start:].split(maxsplit=2)[1]) // 1024
+    logger.info("Total amount of memory: %u MB", total_mem)
     return total_mem
 
 
 def get_max_network_speed() -> int:
     """Get maximum Ethernet network interface speed in Mb/s."""
     max_speed = 0
-    interfaces = os.listdir("/sys/class/net")
-    assert len(interfaces) > 1
-    for interface in interfaces:
-        if interface == "lo":
-            continue
-        filepath = f"/sys/class/net/{interface}/speed"
-        try:
-            with open(filepath, "rt") as f:
-                new_speed = int(f.read())
-        except OSError:
-            logging.getLogger().warning(f"Unable to get speed of interface {interface}")
-            continue
-        logging.getLogger().debug(f"Speed of interface {interface}: {new_speed} Mb/s")
-        max_speed = max(max_speed, new_speed)
-    logging.getLogger().info(f"Maximum interface speed: {max_speed} Mb/s")
+    with os.scandir("/sys/class/net") as it:
+        for entry in it:
+            if not os.path.exists(os.path.join(entry.path, "device")):
+                # virtual interface (lo, bridge, veth, tunnel...)
+                continue
+            interface = entry.name
+            try:
+                new_speed = int(read_kernel_file(os.path.join(entry.path, "speed")))
+            except (OSError, ValueError):
+                # wireless interfaces return EINVAL
+                logger.warning("Unable to get speed of interface %s", interface)
+                continue
+            logger.debug("Speed of interface %s: %u Mb/s", interface, new_speed)
+            max_speed = max(max_speed, new_speed)
+    logger.info("Maximum interface speed: %u Mb/s", max_speed)
     return max_speed
 
 
+def parse_wtmp_reboot_times(data: bytes) -> Optional[List[datetime.datetime]]:
+    """Return reboot times from wtmp file content, or None if its record layout is not the expected one."""
+    if len(data) % UTMP_RECORD.size != 0:
+        return None
+    reboot_times = []
+    for record in UTMP_RECORD.iter_unpack(data):
+        ut_type, tv_sec, tv_usec = record[0], record[9], record[10]
+        # with another layout, fields end up shifted and hold nonsensical values
+        if not (0 <= ut_type <= UTMP_TYPE_MAX) or not (0 <= tv_usec < 1000000):
+            return None
+        if ut_type == UTMP_BOOT_TIME:
+            reboot_times.append(datetime.datetime.fromtimestamp(tv_sec))
+    return reboot_times
+
+
+def get_last_reboot_times(log_filepath: str) -> List[datetime.datetime]:
+    """Return reboot times from a wtmp file using the last command."""
+    date_regex = re.compile(r".*boot\s*([\w\s]+\d{2}:\d{2}:\d{2} \d{4}).*$")
+    cmd = ("last", "-F", "-R", "reboot", "-f", log_filepath)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(cmd_to_string(cmd))
+    output_str = subprocess.run(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        close_fds=False,
+        check=True,
+    ).stdout
+    reboot_times = []
+    for line in output_str.splitlines()[0:-2]:
+        date_match = date_regex.match(line)
+        assert date_match is not None
+        date_str = date_match.group(1).strip()
+        reboot_times.append(
+            datetime.datetime.strptime(date_str, r"%a %b %d %H:%M:%S %Y")
+        )
+    return reboot_times
+
+
 def get_reboot_times() -> List[datetime.datetime]:
     """Return a list of datetime.datetime representing machine reboot times."""
     reboot_times = []
-    date_regex = re.compile(r".*boot\s*([\w\s]+\d{2}:\d{2}:\d{2} \d{4}).*$")
     for i in range(1, -1, -1):
-        log_filepath = "/var/log/wtmp%s" % (".%u" % (i) if i != 0 else "")
+        log_filepath = f"/var/log/wtmp.{i}" if i != 0 else "/var/log/wtmp"
         if os.path.isfile(log_filepath):
-            cmd = ("last", "-F", "-R", "reboot", "-f", log_filepath)
-            logging.getLogger().debug(cmd_to_string(cmd))
-            output_str = subprocess.run(
-                cmd,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.PIPE,
-                universal_newlines=True,
-                check=True,
-            ).stdout
-            output_lines = output_str.splitlines()[0:-2]
-            for line in output_lines:
-                date_match = date_regex.match(line)
-                assert date_match is not None
-                date_str = date_match.group(1).strip()
-                date = datetime.datetime.strptime(date_str, r"%a %b %d %H:%M:%S %Y")
-                reboot_times.append(date)
+            logger.debug("Reading boot records from %r", log_filepath)
+            with open(log_filepath, "rb") as f:
+                data = f.read()
+            file_reboot_times = parse_wtmp_reboot_times(data)
+            if file_reboot_times is None:
+                # eg. 64-bit time fields on aarch64, let last handle the platform layout
+                logger.debug("Unexpected record layout in %r, using last", log_filepath)
+                file_reboot_times = get_last_reboot_times(log_filepath)
+            reboot_times.extend(file_reboot_times)
     return reboot_times
 
 
 def minify_svg(svg_filepath: str) -> str:
     """Open a SVG file, and return its minified content as a string."""
-    logger = logging.getLogger()
     size_before = os.path.getsize(svg_filepath)
 
-    if shutil.which("scour"):
+    if HAS_SCOUR_MODULE:
+        import scour.scour
+
         method = "scour"
-        cmd = (
-            "scour",
-            "-q",
-            "--enable-id-stripping",
-            "--enable-comment-stripping",
-            "--shorten-ids",
-            "--no-line-breaks",
-            "--remove-descriptive-elements",
-            svg_filepath,
-        )
-        logging.getLogger().debug(cmd_to_string(cmd))
-        data = subprocess.run(
-            cmd, stdin=subprocess.DEVNULL, universal_newlines=True, check=True
+        with open(svg_filepath, "rb") as f:
+            raw_data = f.read()
+        with SCOUR_MODULE_LOCK:
+            raw_data = scour.scour.scourString(
+                raw_data, scour.scour.parse_args(list(SCOUR_ARGS))
+            ).encode()
+
+    elif HAS_SCOUR:
+        method = "scour"
+        cmd = ("scour", *SCOUR_ARGS, svg_filepath)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(cmd_to_string(cmd))
+        raw_data = subprocess.run(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            close_fds=False,
+            check=True,
         ).stdout
 
     else:
-        method = "identity"
-        with open(svg_filepath, "rt") as f:
-            data = f.read()
-
-    size_after = len(data.encode())
-    if method != "identity":
+        method = "regex"
+        with open(svg_filepath, "rb") as f:
+            raw_data = f.read()
+        raw_data = SVG_TITLE_REGEX.sub(b"", raw_data)
+        raw_data = SVG_INTER_TAG_WHITESPACE_REGEX.sub(b"><", raw_data)
+
+    size_after = len(raw_data)
+    if size_before > 0:
         logger.debug(
-            f"{method.capitalize()} SVG minification: {size_after - size_before} B "
-            f"({100 * (size_after - size_before) / size_before:.2f}%)"
+            "%s SVG minification: %d B (%.2f%%)",
+            method.capitalize(),
+            size_after - size_before,
+            100 * (size_after - size_before) / size_before,
         )
 
-    return data
+    return raw_data.decode()
+
+
+def crunch_png(png_filepath: str) -> None:
+    """Losslessly optimize PNG file in place."""
+    assert HAS_OPTIPNG or HAS_OXIPNG
+    if HAS_OXIPNG:
+        cmd: Tuple[str, ...] = ("oxipng", "-q", "-s", png_filepath)
+    else:
+        cmd = ("optipng", "-quiet", "-o", "1", png_filepath)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(cmd_to_string(cmd))
+    subprocess.run(cmd, stdin=subprocess.DEVNULL, close_fds=False, check=True)
 
 
 def format_email(
-    exp: str,
-    dest: str,
+    exp: Tuple[str, str],
+    dest: Sequence[Tuple[str, str]],
     subject: str,
     header_text: Optional[str],
     img_format: GraphFormat,
     img_filepaths: Sequence[str],
     alternate_text_filepaths: Sequence[str],
-) -> str:
-    """Format a MIME email with attached images and alternate text, and return email code."""
+) -> email.mime.multipart.MIMEMultipart:
+    """Format a MIME email with attached images and alternate text, and return email message."""
     assert img_format in (GraphFormat.PNG, GraphFormat.SVG)
 
     msg = email.mime.multipart.MIMEMultipart("related")
     msg["Subject"] = subject
-    msg["From"] = exp
-    msg["To"] = dest
+    msg["From"] = email.utils.formataddr(exp)
+    msg["To"] = ", ".join(map(email.utils.formataddr, dest))
 
     # html
     html_lines = ["<html><head></head><body>"]
     if header_text is not None:
         html_lines.append(f"<pre>{header_text}</pre><br>")
     if img_format is GraphFormat.PNG:
-        html_lines.append(
-            "<br>".join(f'<img src="cid:img{i}">' for i in range(len(img_filepaths)))
-        )
+        img_tags = [f'<img src="cid:img{i}">' for i in range(len(img_filepaths))]
+        html_lines.append("<br>".join(img_tags))
     elif img_format is GraphFormat.SVG:
-        for img_filepath in img_filepaths:
-            if img_filepath is not img_filepath[0]:
-                html_lines.append("<br>")
-            data = minify_svg(img_filepath)
-            html_lines.append(data)
+        with contextlib.ExitStack() as cm:
+            svg_datas: Iterable[str]
+            if HAS_SCOUR and not HAS_SCOUR_MODULE:
+                # minification spawns a process per file, so run them concurrently
+                executor = cm.enter_context(concurrent.futures.ThreadPoolExecutor())
+                svg_datas = executor.map(minify_svg, img_filepaths)
+            else:
+                # minification runs in this process and is serialized, threads would not help
+                svg_datas = map(minify_svg, img_filepaths)
+            for i, svg_data in enumerate(svg_datas):
+                if i > 0:
+                    html_lines.append("<br>")
+                html_lines.append(svg_data)
     html_lines.append("</body></html>")
     html_str = "".join(html_lines)
     html = email.mime.text.MIMEText(html_str, "html")
 
     # alternate text
-    alternate_texts = []
+    alternate_texts = [] if header_text is None else [header_text]
     for alternate_text_filepath in alternate_text_filepaths:
-        with open(alternate_text_filepath, "rt") as alternate_text_file:
-            alternate_texts.append(alternate_text_file.read())
-    if header_text is not None:
-        text_str = f"{header_text}\n"
-    else:
-        text_str = ""
-    text_str += "\n".join(alternate_texts)
-    text = email.mime.text.MIMEText(text_str)
+        alternate_texts.append(pathlib.Path(alternate_text_filepath).read_text())
 
     msg_alt = email.mime.multipart.MIMEMultipart("alternative")
-    msg_alt.attach(text)
+    if alternate_texts:
+        msg_alt.attach(email.mime.text.MIMEText("\n".join(alternate_texts)))
     msg_alt.attach(html)
     msg.attach(msg_alt)
 
     if img_format is GraphFormat.PNG:
         for i, img_filepath in enumerate(img_filepaths):
+            # encode from the mapped file, which saves a copy of the raw image data (not of the encoded data)
+            msg_img = email.mime.image.MIMEImage(
+                b"", "png", _encoder=email.encoders.encode_noop
+            )
             with open(img_filepath, "rb") as img_file:
-                msg_img = email.mime.image.MIMEImage(img_file.read())
+                if os.fstat(img_file.fileno()).st_size == 0:
+                    # empty files can not be mapped
+                    encoded_data = base64.encodebytes(img_file.read())
+                else:
+                    with mmap.mmap(
+                        img_file.fileno(), 0, access=mmap.ACCESS_READ
+                    ) as img_data:
+                        encoded_data = base64.encodebytes(img_data)
+            msg_img.set_payload(encoded_data.decode("ascii"))
+            msg_img["Content-Transfer-Encoding"] = "base64"
             msg_img.add_header("Content-ID", f"<img{i}>")
             msg.attach(msg_img)
 
-    return msg.as_string()
+    return msg
 
 
 class SysstatData:
@@ -248,25 +404,23 @@ class SysstatData:
         self.report_type = report_type
         self.temp_dir = temp_dir
         self.sa_filepaths: List[str] = []
+        self.sa_source_filepaths: List[str] = []
         today = datetime.date.today()
         filepath_formats = [
             os.path.join("/var/log", subdir, leaf_path)
             for subdir in ("sysstat", "sa")
-            for leaf_path in (r"sa%d", r"%Y%m/sa%d", r"sa%Y%m%d")
+            for leaf_path in (
+                "sa{day:02}",
+                "{year:04}{month:02}/sa{day:02}",
+                "sa{year:04}{month:02}{day:02}",
+            )
         ]
 
         if report_type is ReportType.DAILY:
-            date = today - datetime.timedelta(days=1)
-            filepath = self.getSysstatDataFilepath(date, filepath_formats, temp_dir)
-            if filepath is not None:
-                self.sa_filepaths.append(filepath)
+            dates = [today - datetime.timedelta(days=1)]
 
         elif report_type is ReportType.WEEKLY:
-            for i in range(7, 0, -1):
-                date = today - datetime.timedelta(days=i)
-                filepath = self.getSysstatDataFilepath(date, filepath_formats, temp_dir)
-                if filepath is not None:
-                    self.sa_filepaths.append(filepath)
+            dates = [today - datetime.timedelta(days=i) for i in range(7, 0, -1)]
 
         elif report_type is ReportType.MONTHLY:
             if today.month == 1:
@@ -275,148 +429,228 @@ class SysstatData:
             else:
                 year = today.year
                 month = today.month - 1
-            for day in range(1, calendar.monthrange(year, month)[1] + 1):
-                date = datetime.date(year, month, day)
-                filepath = self.getSysstatDataFilepath(date, filepath_formats, temp_dir)
-                if filepath is not None:
-                    self.sa_filepaths.append(filepath)
+            dates = [
+                datetime.date(year, month, day)
+                for day in range(1, calendar.monthrange(year, month)[1] + 1)
+            ]
+
+        # only locate files here, decompression is done by prepareFiles, when the report is actually generated
+        for date in dates:
+            filepath = self.getSysstatDataFilepath(date, filepath_formats)
+            if filepath is not None:
+                self.sa_source_filepaths.append(filepath)
+
+    def prepareFiles(self) -> None:
+        """Decompress data files if needed, so that sadf can read them."""
+        # decompression releases the GIL, so run it concurrently
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            self.sa_filepaths = list(
+                executor.map(self.getUsableFilepath, self.sa_source_filepaths)
+            )
+
+    def getUsableFilepath(self, source_filepath: str) -> str:
+        """Return path of a data file readable by sadf, decompress it in temp dir if needed."""
+        filepath, ext = os.path.splitext(source_filepath)
+        if ext not in DECOMPRESSORS:
+            return source_filepath
+        decompressed_filepath = os.path.join(self.temp_dir, os.path.basename(filepath))
+        self.decompress(source_filepath, decompressed_filepath)
+        return decompressed_filepath
 
     @staticmethod
     def decompress(in_filepath: str, out_filepath: str) -> None:
         """Decompress gzip, bzip2, or lzma input file to output file."""
-        logging.getLogger().debug(
-            f"Decompressing {in_filepath!r} to {out_filepath!r}..."
-        )
-        with contextlib.ExitStack() as cm:
-            ext = os.path.splitext(in_filepath)[-1].lower()
-            if ext == ".gz":
-                in_file: Union[gzip.GzipFile, bz2.BZ2File, lzma.LZMAFile] = (
-                    cm.enter_context(gzip.open(in_filepath, "rb"))
+        logger.debug("Decompressing %r to %r...", in_filepath, out_filepath)
+        ext = os.path.splitext(in_filepath)[1].lower()
+        if ext not in DECOMPRESSORS:
+            raise ValueError(f"Unknown compression for {in_filepath!r}")
+        cmds, python_open = DECOMPRESSORS[ext]
+        cmd = next((cmd for cmd in cmds if shutil.which(cmd[0])), None)
+        with open(out_filepath, "wb") as out_file:
+            if cmd is not None:
+                # external tools are faster, and pigz/pbzip2/xz can use several cores
+                # (input path is always absolute, so it can not be mistaken for an option)
+                cmd = (*cmd, in_filepath)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(cmd_to_string(cmd))
+                subprocess.run(
+                    cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=out_file,
+                    close_fds=False,
+                    check=True,
                 )
-            elif ext == ".bz2":
-                in_file = cm.enter_context(bz2.open(in_filepath, "rb"))
-            elif ext == ".xz":
-                in_file = cm.enter_context(lzma.open(in_filepath, "rb"))
-            out_file = cm.enter_context(open(out_filepath, "wb"))
-            shutil.copyfileobj(in_file, out_file)
+            else:
+                with python_open(in_filepath, "rb") as in_file:
+                    shutil.copyfileobj(in_file, out_file, IO_BUFFER_SIZE)
+
+    @staticmethod
+    @functools.lru_cache()
+    def listDir(dirpath: str) -> FrozenSet[str]:
+        """Return names of entries in a directory, or an empty set if it does not exist, cached to save syscalls."""
+        try:
+            return frozenset(os.listdir(dirpath))
+        except OSError:
+            return frozenset()
 
     @classmethod
     def getSysstatDataFilepath(
-        cls, date, filepath_formats: Sequence[str], temp_dir: str
+        cls, date, filepath_formats: Sequence[str]
     ) -> Optional[str]:
-        """Get data file path for requested date, decompress file in needed, return filepath or None if not found."""
+        """Get data file path for requested date, possibly compressed, or None if not found."""
         for filepath_format in filepath_formats:
-            filepath = date.strftime(filepath_format)
-            if not os.path.isfile(filepath):
-                compressed_filepaths = (
-                    f"{filepath}.{ext}" for ext in ("gz", "bz2", "xz")
-                )
-                for compressed_filepath in compressed_filepaths:
-                    if os.path.isfile(compressed_filepath):
-                        filepath = os.path.join(temp_dir, os.path.basename(filepath))
-                        cls.decompress(compressed_filepath, filepath)
-                        return filepath
-            else:
+            # str.format is much cheaper than strftime for these simple fields
+            filepath = filepath_format.format(
+                year=date.year, month=date.month, day=date.day
+            )
+            dirpath, filename = os.path.split(filepath)
+            dir_entries = cls.listDir(dirpath)
+            if filename in dir_entries:
                 return filepath
-        logging.getLogger().warning(f"No sysstat data file for date {date}")
+            for ext in DECOMPRESSORS:
+                if f"{filename}{ext}" in dir_entries:
+                    return f"{filepath}{ext}"
+        logger.warning("No sysstat data file for date %s", date)
         return None
 
     def hasEnoughData(self) -> bool:
         """Return True if enough sysstat data files have been found to plot something, False instead."""
         if self.report_type is ReportType.DAILY:
-            return bool(self.sa_filepaths)
+            return bool(self.sa_source_filepaths)
         else:
-            return len(self.sa_filepaths) >= 2
+            return len(self.sa_source_filepaths) >= 2
 
     def generateRawCsv(
-        self, dtype: SysstatDataType, sa_filepath: str, output_file: IO[str]
+        self, dtype: SysstatDataType, sa_filepath: str, output_file: IO[bytes]
     ) -> None:
-        """Extract stats from sa file and write them in CSV format to text file."""
-        tmp_csv_files = []
+        """Extract stats from sa file and write them in CSV format to binary file."""
         with contextlib.ExitStack() as cm:
-            for i, sadf_cmd in enumerate(self.SADF_CMDS[dtype]):
-                tmp_csv_file = cm.enter_context(
-                    tempfile.TemporaryFile(
-                        "w+t",
-                        prefix=f"{dtype.name.lower()}_{i:02}",
-                        suffix=".csv",
-                        dir=self.temp_dir,
-                    )
-                )
+            sadf_procs = []
+            sadf_outputs = []
+            for sadf_cmd in self.SADF_CMDS[dtype]:
                 cmd = ["sadf", "-d", "-U", "--"]
                 cmd.extend(sadf_cmd)
                 cmd.append(sa_filepath)
-                logging.getLogger().debug(cmd_to_string(cmd))
-                subprocess.run(
-                    cmd,
-                    stdin=subprocess.DEVNULL,
-                    stdout=tmp_csv_file,
-                    universal_newlines=True,
-                    check=True,
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(cmd_to_string(cmd))
+                sadf_proc = cm.enter_context(
+                    subprocess.Popen(
+                        cmd,
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.PIPE,
+                        close_fds=False,
+                    )
                 )
-                tmp_csv_file.seek(0)
-                tmp_csv_files.append(tmp_csv_file)
-            self.mergeCsvFiles(tmp_csv_files, output_file)
+                assert sadf_proc.stdout is not None
+                sadf_procs.append(sadf_proc)
+                sadf_outputs.append(sadf_proc.stdout)
+            # read sadf output directly from the pipes, without storing it first
+            try:
+                self.mergeCsvFiles(sadf_outputs, output_file)
+            except Exception as e:
+                # a sadf failure also breaks parsing of its output, report the sadf error instead
+                for sadf_proc, sadf_output in zip(sadf_procs, sadf_outputs):
+                    # unblock sadf if it is still writing
+                    sadf_output.close()
+                    if sadf_proc.wait() > 0:
+                        raise subprocess.CalledProcessError(
+                            sadf_proc.returncode, sadf_proc.args
+                        ) from e
+                raise
+            for sadf_proc in sadf_procs:
+                if sadf_proc.wait() != 0:
+                    raise subprocess.CalledProcessError(
+                        sadf_proc.returncode, sadf_proc.args
+                    )
 
     def mergeCsvFiles(
-        self, source_files: Sequence[IO[str]], dest_file: IO[str]
+        self, source_files: Sequence[IO[bytes]], dest_file: IO[bytes]
     ) -> None:
         """Merge several CSV files into one with same number of lines."""
-        filtered_source_files = []
-        with contextlib.ExitStack() as cm:
-            sources_columns = []
-            for source_file in source_files:
-                # get columns
-                sources_columns.append(self.getCsvColumns(source_file))
-
-                # filter input files
-                filtered_source_file = cm.enter_context(
-                    tempfile.TemporaryFile("w+t", suffix=".csv", dir=self.temp_dir)
-                )
-                self.filterRawCsv(source_file, filtered_source_file)
-                filtered_source_file.seek(0)
-                filtered_source_files.append(filtered_source_file)
-
-            # merge line per line
-            first_line = True
-            for sources_line in zip(*filtered_source_files):
-                added_fields_names = []
-                row = []
-                for source_columns, source_line in zip(sources_columns, sources_line):
-                    fields = source_line.rstrip().split(";")
-                    for field_name, field in zip(source_columns, fields):
-                        if field_name not in added_fields_names:
-                            added_fields_names.append(field_name)
-                            row.append(field)
-                if first_line:
-                    # write column names
-                    dest_file.write(f"# {';'.join(added_fields_names)}\n")
-                    first_line = False
-                dest_file.write(f"{';'.join(row)}\n")
-
-    def getCsvColumns(self, csv_file: IO[str]) -> Sequence[str]:
+        # get columns
+        sources_columns = tuple(
+            tuple(self.getCsvColumns(source_file)) for source_file in source_files
+        )
+
+        # column layout is the same for all lines and all files of a report, so compute it once
+        added_fields_names, sources_field_indexes = self.getMergeLayout(sources_columns)
+
+        # filter input files on the fly, and merge line per line
+        first_line = True
+        for sources_line in zip(*map(self.filterRawCsv, source_files)):
+            row: List[bytes] = []
+            for source_field_indexes, source_line in zip(
+                sources_field_indexes, sources_line
+            ):
+                if source_field_indexes is None:
+                    row.append(source_line.rstrip())
+                else:
+                    fields = source_line.rstrip().split(b";")
+                    row.extend(map(fields.__getitem__, source_field_indexes))
+            if first_line:
+                # write column names
+                dest_file.write(f"# {';'.join(added_fields_names)}\n".encode())
+                first_line = False
+            dest_file.write(b";".join(row))
+            dest_file.write(b"\n")
+
+        # consume any extra lines, so that no writer blocks on a full pipe
+        for source_file in source_files:
+            while source_file.read(IO_BUFFER_SIZE):
+                pass
+
+    @staticmethod
+    @functools.lru_cache()
+    def getMergeLayout(
+        sources_columns: Tuple[Tuple[str, ...], ...],
+    ) -> Tuple[Sequence[str], Sequence[Optional[Sequence[int]]]]:
+        """Return merged column names, and indexes of fields to keep for each source (None to keep all of them)."""
+        added_fields_names = []
+        added_fields_names_set = set()
+        sources_field_indexes: List[Optional[Sequence[int]]] = []
+        for source_columns in sources_columns:
+            field_indexes = []
+            for i, field_name in enumerate(source_columns):
+                if field_name not in added_fields_names_set:
+                    added_fields_names_set.add(field_name)
+                    added_fields_names.append(field_name)
+                    field_indexes.append(i)
+            if len(field_indexes) == len(source_columns):
+                # all fields are kept, no need to split lines
+                sources_field_indexes.append(None)
+            else:
+                sources_field_indexes.append(tuple(field_indexes))
+        return tuple(added_fields_names), tuple(sources_field_indexes)
+
+    def getCsvColumns(self, csv_file: Iterable[bytes]) -> Sequence[str]:
         """Extract column names from CSV file."""
-        line = next(itertools.dropwhile(lambda x: not x.startswith("#"), csv_file))
-        columns = line[2:-1].split(";")
+        line = next(
+            itertools.dropwhile(lambda x: not x.startswith(b"#"), csv_file), None
+        )
+        if line is None:
+            raise ValueError("No CSV header found")
+        columns = line[2:-1].decode().split(";")
         return columns
 
-    def filterRawCsv(self, in_file: IO[str], out_file: IO[str]) -> None:
-        """Filter CSV file by removing lines that gnuplot would not parse."""
+    def filterRawCsv(self, in_file: Iterable[bytes]) -> Iterator[bytes]:
+        """Filter CSV lines by removing lines that gnuplot would not parse."""
         for line in in_file:
-            if line.startswith("#"):
+            if line.startswith(b"#"):
                 # comment lines are correctly ignored by gnuplot, but we remove them for clarity
                 # (they can appear several times and in the middle of the CSV file if a reboot occurs)
                 continue
-            fields = line.rstrip().split(";")
-            if int(fields[1]) == -1:  # fields[3] == "LINUX-RESTART"
+            # check second field without splitting the whole line
+            sep1 = line.find(b";")
+            sep2 = line.find(b";", sep1 + 1)
+            if line[sep1 + 1 : sep2] == b"-1":  # fields[3] == "LINUX-RESTART"
                 continue
-            out_file.write(line)
+            yield line
 
     def generateDataToPlot(
-        self, dtype: SysstatDataType, output_filepath: str
+        self, dtype: SysstatDataType, output_filepath: str, max_workers: int
     ) -> Tuple[Sequence[int], Dict[str, str]]:
         """
-        Generate data to plot (';' separated values).
+        Generate data to plot (';' separated values), running sadf for at most max_workers data files at once.
 
         Return indexes of columns to use in output, and a dictionary of name -> filepath output datafiles if the
         provided output file had to be split.
@@ -424,13 +658,32 @@ class SysstatData:
         assert dtype in SysstatDataType
         output_filepaths = {}
 
-        with open(output_filepath, "w+t") as output_file:
-            for sa_filepath in self.sa_filepaths:
-                self.generateRawCsv(dtype, sa_filepath, output_file)
-
-            # get columns
-            output_file.seek(0)
-            columns = self.getCsvColumns(output_file)
+        # sadf only accepts a single data file per invocation, so run them concurrently and concatenate in order
+        with contextlib.ExitStack() as cm:
+            raw_csv_files = [
+                cm.enter_context(
+                    tempfile.TemporaryFile(
+                        "w+b",
+                        buffering=IO_BUFFER_SIZE,
+                        suffix=".csv",
+                        dir=self.temp_dir,
+                    )
+                )
+                for _ in self.sa_filepaths
+            ]
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers
+            ) as executor:
+                # consume results to propagate exceptions
+                list(
+                    executor.map(
+                        functools.partial(self.generateRawCsv, dtype),
+                        self.sa_filepaths,
+                        raw_csv_files,
+                    )
+                )
+            for raw_csv_file in raw_csv_files:
+                raw_csv_file.seek(0)
 
             if dtype in (SysstatDataType.NET, SysstatDataType.FS_USAGE):
                 # find varying data field in csv file
@@ -439,20 +692,30 @@ class SysstatData:
                     SysstatDataType.FS_USAGE: ("filesystems", 3),
                 }
                 data_field_name, data_field_index = data_field_info[dtype]
-                data_fields = list(
-                    self.getUniqueFieldValuesFromCsv(output_file, data_field_index)
+
+                # get columns and split by varying field in the same pass, the concatenated file is never written
+                lines = itertools.chain.from_iterable(raw_csv_files)
+                columns = self.getCsvColumns(lines)
+                output_filepaths = self.splitCsvFile(
+                    lines, data_field_index, output_filepath
                 )
-                data_fields.sort()
-                logging.getLogger().debug(
-                    f"Found {len(data_fields)} {data_field_name}: {', '.join(data_fields)}"
+                logger.debug(
+                    "Found %u %s: %s",
+                    len(output_filepaths),
+                    data_field_name,
+                    ", ".join(output_filepaths),
                 )
-                base_filename, ext = os.path.splitext(output_filepath)
-                for i, df in enumerate(data_fields, 1):
-                    output_filepaths[df] = f"{base_filename}_{i}{ext}"
 
-                # split file by varying field
-                output_file.seek(0)
-                self.splitCsvFile(output_file, 3, output_filepaths)
+            else:
+                with open(
+                    output_filepath, "w+b", buffering=IO_BUFFER_SIZE
+                ) as output_file:
+                    for raw_csv_file in raw_csv_files:
+                        shutil.copyfileobj(raw_csv_file, output_file, IO_BUFFER_SIZE)
+
+                    # get columns
+                    output_file.seek(0)
+                    columns = self.getCsvColumns(output_file)
 
         indexes = self.getColumnIndexes(self.CSV_COLUMNS[dtype], columns)
 
@@ -463,40 +726,41 @@ class SysstatData:
         needed_column_names: Sequence[str], column_names: Sequence[str]
     ) -> Sequence[int]:
         """Return column indexes matching the given column names, to be used by Gnuplot."""
-        indexes = []
-        for needed_column_name in needed_column_names:
-            indexes.append(
-                column_names.index(needed_column_name) + 1
-            )  # gnuplot indexes start at 1
-        return tuple(indexes)
+        # gnuplot indexes start at 1
+        column_indexes = {name: i for i, name in enumerate(column_names, 1)}
+        return tuple(column_indexes[name] for name in needed_column_names)
 
     @staticmethod
     def splitCsvFile(
-        input_file: IO[str], column_index: int, output_files: Dict[str, str]
-    ) -> None:
-        """Split input file according to a given column index, and output filepaths dict."""
+        input_lines: Iterable[bytes], column_index: int, output_filepath: str
+    ) -> Dict[str, str]:
+        """
+        Split input lines in a single pass according to a given column index.
+
+        Return a dictionary of column value -> output filepath, sorted by column value.
+        """
+        base_filename, ext = os.path.splitext(output_filepath)
+        output_filepaths = {}
         with contextlib.ExitStack() as ctx:
-            files = {}
-            for k, filepath in output_files.items():
-                files[k] = ctx.enter_context(open(filepath, "wt"))
-            for line in input_file:
-                if line.startswith("#"):
+            files: Dict[bytes, IO[bytes]] = {}
+            for line in input_lines:
+                if line.startswith(b"#"):
                     continue
-                fields = line.split(";")
-                k = fields[column_index]
-                files[k].write(line)
-
-    @staticmethod
-    def getUniqueFieldValuesFromCsv(in_file: IO[str], index: int) -> Set[str]:
-        """Extract unique field values from a CSV file."""
-        values = set()
-        for line in itertools.filterfalse(
-            operator.methodcaller("startswith", "#"), in_file
-        ):
-            fields = line.split(";", index + 2)
-            value = fields[index]
-            values.add(value)
-        return values
+                # locate field without splitting the whole line
+                start = 0
+                for _ in range(column_index):
+                    start = line.index(b";", start) + 1
+                k = line[start : line.index(b";", start)]
+                try:
+                    file = files[k]
+                except KeyError:
+                    filepath = f"{base_filename}_{len(files) + 1}{ext}"
+                    output_filepaths[k.decode()] = filepath
+                    file = files[k] = ctx.enter_context(
+                        open(filepath, "wb", buffering=IO_BUFFER_SIZE)
+                    )
+                file.write(line)
+        return dict(sorted(output_filepaths.items()))
 
 
 class Plotter:
@@ -519,7 +783,6 @@ class Plotter:
             "title": "Memory",
             "data_titles": ("other", "buffers", "cached", "dirty"),
             "ylabel": "Memory used (MB)",
-            "yrange": (0, get_total_memory_mb()),
         },
         SysstatDataType.SWAP: {
             "title": "Swap",
@@ -531,7 +794,6 @@ class Plotter:
             "title": "Network",
             "data_titles": ("rx", "tx"),
             "ylabel": "Bandwith (Mb/s)",
-            "yrange": (0, f"{get_max_network_speed()}<*"),
         },
         SysstatDataType.SOCKET: {
             "title": "Sockets",
@@ -559,10 +821,70 @@ class Plotter:
         },
     }
 
-    def __init__(self, report_type: ReportType):
+    @staticmethod
+    @functools.lru_cache()
+    def getPlotArgs(data_type: SysstatDataType) -> Dict[str, Any]:
+        """Return plot arguments for a data type, only probing the system for the ones that need it."""
+        plot_args = Plotter.PLOT_ARGS[data_type].copy()
+        if data_type is SysstatDataType.MEM:
+            plot_args["yrange"] = (0, get_total_memory_mb())
+        elif data_type is SysstatDataType.NET:
+            plot_args["yrange"] = (0, f"{get_max_network_speed()}<*")
+        return plot_args
+
+    def __init__(
+        self, report_type: ReportType, reboot_times: Sequence[datetime.datetime]
+    ):
         assert report_type in ReportType
         self.report_type = report_type
 
+        # x axis setup, the same for all graphs
+        self.x_axis_code_lines: List[str] = []
+        if self.report_type is ReportType.MONTHLY:
+            self.x_axis_code_lines.append(f"set xtics {60 * 60 * 24 * 2}")  # 2 days
+        now = datetime.datetime.now()
+        if self.report_type is ReportType.DAILY:
+            date_to = datetime.datetime(now.year, now.month, now.day)
+            date_from = date_to - datetime.timedelta(days=1)
+        elif self.report_type is ReportType.WEEKLY:
+            date_to = datetime.datetime(now.year, now.month, now.day)
+            date_from = date_to - datetime.timedelta(weeks=1)
+        elif self.report_type is ReportType.MONTHLY:
+            today = datetime.date.today()
+            if today.month == 1:
+                year = today.year - 1
+                month = 12
+            else:
+                year = today.year
+                month = today.month - 1
+            date_from = datetime.datetime(year, month, 1)
+            date_to = datetime.datetime(
+                year, month, calendar.monthrange(year, month)[1]
+            )
+        self.gmtoff = time.localtime().tm_gmtoff
+        gmtoff_delta = datetime.timedelta(seconds=self.gmtoff)
+        date_from = date_from + gmtoff_delta
+        date_to = date_to + gmtoff_delta
+        self.x_axis_code_lines.append(
+            f'set xrange["{date_from.strftime(r"%s")}":"{date_to.strftime(r"%s")}"]'
+        )
+        self.x_axis_code_lines.append(
+            f"set format x '{GNUPLOT_X_FORMATS[self.report_type]}'"
+        )
+
+        # reboot lines, the same for all graphs
+        self.reboot_code_lines: List[str] = []
+        for reboot_time in reboot_times:
+            reboot_time = reboot_time + gmtoff_delta
+            if date_from <= reboot_time <= date_to:
+                reboot_ts = reboot_time.strftime(r"%s")
+                self.reboot_code_lines.append(
+                    f'set arrow from "{reboot_ts}",graph 0 to "{reboot_ts}",graph 1 lt 0 nohead front'
+                )
+                self.reboot_code_lines.append(
+                    f'set label "reboot" at "{reboot_ts}",graph 0 right rotate by 45 font \'Liberation,7\''
+                )
+
     def plot(  # noqa: C901
         self,
         format: GraphFormat,
@@ -570,7 +892,6 @@ class Plotter:
         data_filepaths: Dict[str, str],
         data_indexes: Sequence[int],
         data_type: SysstatDataType,
-        reboot_times: Sequence[datetime.datetime],
         output_filepath: str,
         smooth: bool,
         title: str,
@@ -584,71 +905,23 @@ class Plotter:
         gnuplot_code_lines: List[str] = []
 
         # output setup
-        if format is GraphFormat.TXT:
-            gnuplot_code_lines.extend(
-                ("set terminal dumb 110,25", f"set output '{output_filepath}'")
-            )
-        elif format is GraphFormat.PNG:
-            gnuplot_code_lines.extend(
-                (
-                    f"set terminal png size {img_size[0]},{img_size[1]} font 'Liberation,9' noenhanced",
-                    f"set output '{output_filepath}'",
-                )
-            )
-        elif format is GraphFormat.SVG:
-            gnuplot_code_lines.extend(
-                (
-                    f"set terminal svg size {img_size[0]},{img_size[1]} font 'Liberation,9' noenhanced",
-                    f"set output '{output_filepath}'",
-                )
-            )
+        gnuplot_code_lines.append(
+            GNUPLOT_TERMINALS[format].format(width=img_size[0], height=img_size[1])
+        )
+        if format is not GraphFormat.TXT:
+            # text output is read from stdout for post processing
+            gnuplot_code_lines.append(f"set output '{output_filepath}'")
 
-        # input data setup
+        # input data, caption & x axis common setup
         if data_type is SysstatDataType.LOAD:
             gnuplot_code_lines.append("set decimalsign locale")
-        gnuplot_code_lines.extend((r"set timefmt '%s'", "set datafile separator ';'"))
+        gnuplot_code_lines.extend(GNUPLOT_COMMON_CODE_LINES)
 
         # title
         gnuplot_code_lines.append(f"set title '{title}'")
 
-        # caption
-        gnuplot_code_lines.append(
-            "set key outside right samplen 3 spacing 1.75 width 2"
-        )
-
         # x axis setup
-        gnuplot_code_lines.extend(("set xdata time", "set xlabel 'Time'"))
-        if self.report_type is ReportType.MONTHLY:
-            gnuplot_code_lines.append(f"set xtics {60 * 60 * 24 * 2}")  # 2 days
-        now = datetime.datetime.now()
-        if self.report_type is ReportType.DAILY:
-            date_to = datetime.datetime(now.year, now.month, now.day)
-            date_from = date_to - datetime.timedelta(days=1)
-            format_x = "%R"
-        elif self.report_type is ReportType.WEEKLY:
-            date_to = datetime.datetime(now.year, now.month, now.day)
-            date_from = date_to - datetime.timedelta(weeks=1)
-            format_x = r"%a %d/%m"
-        elif self.report_type is ReportType.MONTHLY:
-            today = datetime.date.today()
-            if today.month == 1:
-                year = today.year - 1
-                month = 12
-            else:
-                year = today.year
-                month = today.month - 1
-            date_from = datetime.datetime(year, month, 1)
-            date_to = datetime.datetime(
-                year, month, calendar.monthrange(year, month)[1]
-            )
-            format_x = r"%d"
-        date_from = date_from + datetime.timedelta(seconds=time.localtime().tm_gmtoff)
-        date_to = date_to + datetime.timedelta(seconds=time.localtime().tm_gmtoff)
-        gnuplot_code_lines.append(
-            'set xrange["%s":"%s"]'
-            % (date_from.strftime(r"%s"), date_to.strftime(r"%s"))
-        )
-        gnuplot_code_lines.append(f"set format x '{format_x}'")
+        gnuplot_code_lines.extend(self.x_axis_code_lines)
 
         # y axis setup
         gnuplot_code_lines.append(f"set ylabel '{ylabel}'")
@@ -657,68 +930,59 @@ class Plotter:
             gnuplot_code_lines.append(f"set yrange [{yrange_str[0]}:{yrange_str[1]}]")
 
         # reboot lines
-        for reboot_time in reboot_times:
-            reboot_time = reboot_time + datetime.timedelta(
-                seconds=time.localtime().tm_gmtoff
-            )
-            if date_from <= reboot_time <= date_to:
-                reboot_ts = reboot_time.strftime(r"%s")
-                gnuplot_code_lines.append(
-                    f'set arrow from "{reboot_ts}",graph 0 to "{reboot_ts}",graph 1 lt 0 nohead front'
-                )
-                gnuplot_code_lines.append(
-                    f'set label "reboot" at "{reboot_ts}",graph 0 right rotate by 45 font \'Liberation,7\''
-                )
+        gnuplot_code_lines.extend(self.reboot_code_lines)
 
         # plot
         assert len(data_indexes) - 1 == len(data_titles)
         plot_cmds = []
         stacked = data_type in (SysstatDataType.CPU, SysstatDataType.MEM)
+        plot_type = "filledcurve x1" if stacked else "line"
+        smooth_str = "smooth bezier " if smooth else ""
+        xdata = f"(${data_indexes[0]}+{self.gmtoff})"
+        # y data expressions do not depend on the data file, so build them once
+        ydatas = []
+        prev_ydata = None
+        for data_index, data_title in zip(data_indexes[1:], data_titles):
+            if data_type is SysstatDataType.MEM:
+                ydata = f"${data_index}"
+                if data_title == "other":
+                    # substract other memory columns except free
+                    data_indexes_to_sub = []
+                    for data_index_to_sub, data_title_to_sub in zip(
+                        data_indexes[1:], data_titles
+                    ):
+                        if data_title_to_sub in ("other", "free"):
+                            continue
+                        data_indexes_to_sub.append(data_index_to_sub)
+                    ydata = (
+                        f"({ydata}-{'-'.join(f'${i}' for i in data_indexes_to_sub)})"
+                    )
+                # convert from KB to MB
+                ydata = f"({ydata}/1000)"
+            elif data_type is SysstatDataType.NET:
+                # convert from KB/s to Mb/s
+                ydata = f"(${data_index}/125)"
+            elif data_type is SysstatDataType.IO:
+                # convert from block/s to MB/s
+                ydata = f"(${data_index}*512/1000000)"
+            else:
+                ydata = f"(${data_index})"
+            if stacked and (prev_ydata is not None):
+                # values are cumulative
+                ydata = f"({ydata}+{prev_ydata})"
+            ydatas.append(ydata)
+            prev_ydata = ydata
         for data_file_nickname, data_filepath in data_filepaths.items():
-            prev_ydata = None
-            for data_index, data_title in zip(data_indexes[1:], data_titles):
-                if data_type is SysstatDataType.MEM:
-                    ydata = f"${data_index}"
-                    if data_title == "other":
-                        # substract other memory columns except free
-                        data_indexes_to_sub = []
-                        for data_index_to_sub, data_title_to_sub in zip(
-                            data_indexes[1:], data_titles
-                        ):
-                            if data_title_to_sub in ("other", "free"):
-                                continue
-                            data_indexes_to_sub.append(data_index_to_sub)
-                        ydata = "(%s-%s)" % (
-                            ydata,
-                            "-".join(f"${i}" for i in data_indexes_to_sub),
-                        )
-                    # convert from KB to MB
-                    ydata = f"({ydata}/1000)"
-                elif data_type is SysstatDataType.NET:
-                    # convert from KB/s to Mb/s
-                    ydata = f"(${data_index}/125)"
-                elif data_type is SysstatDataType.IO:
-                    # convert from block/s to MB/s
-                    ydata = f"(${data_index}*512/1000000)"
-                else:
-                    ydata = f"(${data_index})"
+            for ydata, data_title in zip(ydatas, data_titles):
                 if data_file_nickname:
                     if not data_title:
                         data_title = data_file_nickname
                     else:
                         data_title = f"{data_file_nickname}_{data_title}"
-                if stacked:
-                    plot_type = "filledcurve x1"
-                    if prev_ydata is not None:
-                        # values are cumulative
-                        ydata = f"({ydata}+{prev_ydata})"
-                else:
-                    plot_type = "line"
                 plot_cmds.append(
-                    f"'{data_filepath}' using (${data_indexes[0]}+{time.localtime().tm_gmtoff}):{ydata}"
-                    f" {'smooth bezier ' if smooth else ''}with {plot_type} title '{data_title}'"
+                    f"'{data_filepath}' using {xdata}:{ydata}"
+                    f" {smooth_str}with {plot_type} title '{data_title}'"
                 )
-                prev_ydata = ydata
         if stacked:
             plot_cmds.reverse()
         gnuplot_code_lines.append(f"plot {', '.join(plot_cmds)}")
@@ -726,47 +990,229 @@ class Plotter:
         # run gnuplot
         gnuplot_code_lines[-1] += ";"
         gnuplot_code = ";\n".join(gnuplot_code_lines)
-        logging.getLogger().debug(gnuplot_code)
-        subprocess.run(
+        logger.debug(gnuplot_code)
+        output = subprocess.run(
             ("gnuplot",),
-            input=gnuplot_code,
-            stderr=None
-            if logging.getLogger().isEnabledFor(logging.DEBUG)
-            else subprocess.DEVNULL,
-            universal_newlines=True,
+            input=gnuplot_code.encode(),
+            stdout=subprocess.PIPE if format is GraphFormat.TXT else None,
+            stderr=None if logger.isEnabledFor(logging.DEBUG) else subprocess.DEVNULL,
+            close_fds=False,
             check=True,
-        )
+        ).stdout
 
         # output post processing
-        if format is GraphFormat.PNG and (HAS_OPTIPNG or HAS_OXIPNG):
-            logging.getLogger().debug(f"Crunching {output_filepath!r}...")
-            if HAS_OXIPNG:
-                cmd: Sequence[str] = ("oxipng", "-q", "-s", output_filepath)
-            else:
-                cmd = ("optipng", "-quiet", "-o", "1", output_filepath)
-            logging.getLogger().debug(cmd_to_string(cmd))
-            subprocess.run(cmd, check=True)
         if format is GraphFormat.TXT:
             # remove first 2 bytes as they cause problems with emails
-            with open(output_filepath, "rt") as output_file:
-                output_file.seek(2)
-                d = output_file.read()
-            with open(output_filepath, "wt") as output_file:
-                output_file.write(d)
+            with open(output_filepath, "wb") as output_file:
+                output_file.write(output[2:])
+
+
+def get_graph_cache_key(data_filepaths: Dict[str, str], params: Any) -> str:
+    """Return a cache key for a graph, from its input data files content and its plot parameters."""
+    h = hashlib.blake2b(repr(params).encode(), digest_size=20)
+    for data_file_nickname, data_filepath in data_filepaths.items():
+        h.update(f"\0{data_file_nickname}\0".encode())
+        with open(data_filepath, "rb") as data_file:
+            for chunk in iter(functools.partial(data_file.read, IO_BUFFER_SIZE), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def evict_graph_cache(cache_dir: str, max_size: int) -> None:
+    """Remove least recently used graphs from cache directory until its total size is below max_size."""
+    # other runs may be storing or evicting graphs concurrently, so files can vanish at any time
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(".tmp"):
+                    # graph being stored by another run, or left over by a run that was killed
+                    if time.time() - st.st_mtime > GRAPH_CACHE_TMP_MAX_AGE:
+                        logger.debug("Removing stale %r from graph cache", entry.path)
+                        with contextlib.suppress(OSError):
+                            os.remove(entry.path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError as e:
+        logger.warning("Unable to list graph cache: %s", e)
+        return
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, filepath in sorted(entries):
+        if total_size <= max_size:
+            break
+        logger.debug("Evicting %r from graph cache", filepath)
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Unable to evict graph from cache: %s", e)
+            continue
+        total_size -= size
+
+
+def get_report_key(sa_filepaths: Sequence[str], params: Any) -> str:
+    """Return a key identifying a report, from its data files metadata and its parameters."""
+    h = hashlib.blake2b(repr(params).encode(), digest_size=20)
+    for sa_filepath in sa_filepaths:
+        st = os.stat(sa_filepath)
+        h.update(f"\0{sa_filepath}\0{st.st_mtime_ns}\0{st.st_size}".encode())
+    return h.hexdigest()
+
+
+def plot_cached(
+    plotter: Plotter,
+    cache_dir: Optional[str],
+    graph_format: GraphFormat,
+    img_size: Tuple[int, int],
+    data_filepaths: Dict[str, str],
+    data_indexes: Sequence[int],
+    data_type: SysstatDataType,
+    output_filepath: str,
+    smooth: bool,
+    plot_args: Dict[str, Any],
+    crunch_min_size: int,
+) -> None:
+    """Plot and crunch graph, or copy it from the cache if it was already plotted from the same data and parameters."""
+    crunch = (graph_format is GraphFormat.PNG) and (HAS_OPTIPNG or HAS_OXIPNG)
+    cache_filepath = None
+    if cache_dir is not None:
+        params = (
+            graph_format.name,
+            img_size,
+            tuple(data_indexes),
+            data_type.name,
+            smooth,
+            sorted(plot_args.items()),
+            plotter.x_axis_code_lines,
+            plotter.reboot_code_lines,
+            plotter.gmtoff,
+            # same plot crunched or not makes a different file
+            crunch_min_size if crunch else None,
+        )
+        cache_filepath = os.path.join(
+            cache_dir,
+            f"{get_graph_cache_key(data_filepaths, params)}.{graph_format.name.lower()}",
+        )
+        try:
+            shutil.copyfile(cache_filepath, output_filepath)
+        except FileNotFoundError:
+            pass
+        else:
+            logger.debug("Got %r from graph cache", output_filepath)
+            # refresh LRU timestamp, the graph may have been evicted by another run in the meantime
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(cache_filepath)
+            return
+
+    plotter.plot(
+        graph_format,
+        img_size,
+        data_filepaths,
+        data_indexes,
+        data_type,
+        output_filepath,
+        smooth,
+        **plot_args,
+    )
+
+    # crunch each PNG as soon as it is plotted, so that it overlaps with other data types being processed
+    if crunch and (os.path.getsize(output_filepath) >= crunch_min_size):
+        crunch_png(output_filepath)
+
+    if cache_filepath is not None:
+        try:
+            # write to a temporary file first, so that concurrent runs never see a partial graph
+            tmp_cache_filepath = f"{cache_filepath}.{os.getpid()}.tmp"
+            shutil.copyfile(output_filepath, tmp_cache_filepath)
+            os.replace(tmp_cache_filepath, cache_filepath)
+        except OSError as e:
+            logger.warning("Unable to store graph in cache: %s", e)
+            with contextlib.suppress(OSError):
+                os.remove(tmp_cache_filepath)
+
+
+def process_data_type(
+    data_type: SysstatDataType,
+    sysstat_data: SysstatData,
+    plotter: Plotter,
+    img_format: GraphFormat,
+    img_size: Tuple[int, int],
+    temp_dir: str,
+    cache_dir: Optional[str],
+    text_graph: bool,
+    crunch_min_size: int,
+    sadf_workers: int,
+) -> Dict[GraphFormat, str]:
+    """Extract data and plot text (if requested) & image graphs for a data type, return graph filepaths."""
+    # data
+    logger.info("Extracting %s data...", data_type.name)
+    basename = data_type.name.lower()
+    data_filepath = os.path.join(temp_dir, f"{basename}.csv")
+    indexes, data_filepaths = sysstat_data.generateDataToPlot(
+        data_type, data_filepath, sadf_workers
+    )
+    if not data_filepaths:
+        data_filepaths = {"": data_filepath}
+
+    # plot graphs, both formats are independent gnuplot runs, so plot them concurrently
+    plot_args = Plotter.getPlotArgs(data_type)
+    graph_filepaths = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        futures = []
+        graph_formats = (GraphFormat.TXT, img_format) if text_graph else (img_format,)
+        for graph_format in graph_formats:
+            logger.info("Generating %s %s report...", data_type.name, graph_format.name)
+            graph_filepath = os.path.join(
+                temp_dir, f"{basename}.{graph_format.name.lower()}"
+            )
+            graph_filepaths[graph_format] = graph_filepath
+            futures.append(
+                executor.submit(
+                    plot_cached,
+                    plotter,
+                    cache_dir,
+                    graph_format,
+                    img_size,
+                    data_filepaths,
+                    indexes,
+                    data_type,
+                    graph_filepath,
+                    plotter.report_type is not ReportType.DAILY,
+                    plot_args,
+                    crunch_min_size,
+                )
+            )
+        for future in futures:
+            # propagate exceptions
+            future.result()
+
+    return graph_filepaths
 
 
 if __name__ == "__main__":
     # parse args
     arg_parser = argparse.ArgumentParser(
-        description=__doc__, formatter_class=argparse.ArgumentDefaultsHelpFormatter
+        description=__doc__,
+        epilog="Temporary files are stored in $XDG_RUNTIME_DIR or /dev/shm if available, "
+        "set TMPDIR to use another directory (ie. if they are too small).",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
     arg_parser.add_argument(
         "report_type",
         choices=tuple(t.name.lower() for t in ReportType),
         help="Type of report",
     )
-    arg_parser.add_argument("mail_from", help="Mail sender")
-    arg_parser.add_argument("mail_to", help="Mail destination")
+    arg_parser.add_argument("mail_from", type=email.utils.parseaddr, help="Mail sender")
+    arg_parser.add_argument(
+        "mail_to",
+        nargs="+",
+        help="Mail destination(s), several addresses can also be separated by commas in a single argument",
+    )
     arg_parser.add_argument(
         "-d",
         "--graph-data",
@@ -804,6 +1250,40 @@ if __name__ == "__main__":
         dest="img_format",
         help="Image format to use (SVG breaks rendering for some email clients)",
     )
+    arg_parser.add_argument(
+        "-n",
+        "--no-text",
+        action="store_true",
+        dest="no_text",
+        help="Do not plot text graphs, used as alternate email content for text only mail clients",
+    )
+    arg_parser.add_argument(
+        "--crunch-min-size",
+        type=int,
+        default=0,
+        dest="crunch_min_size",
+        help="Minimum PNG file size in bytes to crunch it, smaller files are sent as is",
+    )
+    arg_parser.add_argument(
+        "-c",
+        "--cache-dir",
+        default=None,
+        dest="cache_dir",
+        help="Directory to cache graphs in, to avoid plotting them again from unchanged data (disabled if not set)",
+    )
+    arg_parser.add_argument(
+        "-u",
+        "--skip-unchanged",
+        action="store_true",
+        dest="skip_unchanged",
+        help="Do not send report if its data files have not changed since the last report sent with the same parameters",
+    )
+    arg_parser.add_argument(
+        "--smtp-host",
+        default=None,
+        dest="smtp_host",
+        help="SMTP server (host[:port]) to submit email to, instead of using sendmail",
+    )
     arg_parser.add_argument(
         "-v",
         "--verbosity",
@@ -813,7 +1293,11 @@ if __name__ == "__main__":
         help="Level of output to display",
     )
     args = arg_parser.parse_args()
-    args.data_type = tuple(SysstatDataType[dt.upper()] for dt in args.data_type)
+    args.mail_to = email.utils.getaddresses(args.mail_to)
+    # remove duplicates, they would write to the same files
+    args.data_type = tuple(
+        dict.fromkeys(SysstatDataType[dt.upper()] for dt in args.data_type)
+    )
     args.img_format = GraphFormat[args.img_format.upper()]
 
     # setup logger
@@ -829,63 +1313,116 @@ if __name__ == "__main__":
 
     # display warning if optipng/oxipng are missing
     if (args.img_format is GraphFormat.PNG) and (not HAS_OPTIPNG) and (not HAS_OXIPNG):
-        logging.getLogger().warning(
+        logger.warning(
             "optipng/oxipng could not be found, PNG crunching will be disabled"
         )
 
     # do the job
     report_type = ReportType[args.report_type.upper()]
+    # intermediate files do not need to persist, so prefer a memory backed filesystem, unless TMPDIR is set
+    temp_dir_parent = None
+    if "TMPDIR" not in os.environ:
+        for candidate_dir in (os.environ.get("XDG_RUNTIME_DIR"), "/dev/shm"):
+            if candidate_dir and os.access(candidate_dir, os.W_OK | os.X_OK):
+                temp_dir_parent = candidate_dir
+                break
     with tempfile.TemporaryDirectory(
-        prefix=f"{os.path.splitext(os.path.basename(inspect.getfile(inspect.currentframe())))[0]}_"  # type: ignore
+        prefix=f"{os.path.splitext(os.path.basename(__file__))[0]}_",
+        dir=temp_dir_parent,
     ) as temp_dir:
         sysstat_data = SysstatData(report_type, temp_dir)
         if not sysstat_data.hasEnoughData():
-            logging.getLogger().error("Not enough data files")
+            logger.error("Not enough data files")
             exit(1)
 
-        plotter = Plotter(report_type)
+        if args.skip_unchanged:
+            if "STATE_DIRECTORY" in os.environ:
+                # set by systemd StateDirectory=
+                state_dir = os.environ["STATE_DIRECTORY"].split(":")[0]
+            else:
+                state_dir = os.path.join(
+                    os.environ.get(
+                        "XDG_STATE_HOME", os.path.expanduser("~/.local/state")
+                    ),
+                    "sysstat_mail_report",
+                )
+            state_filepath = os.path.join(state_dir, f"{args.report_type}_last_key")
+            report_key = get_report_key(
+                sysstat_data.sa_source_filepaths,
+                (
+                    args.mail_from,
+                    args.mail_to,
+                    args.data_type,
+                    args.img_format,
+                    args.img_size,
+                    args.no_text,
+                ),
+            )
+            last_report_key: Optional[str]
+            try:
+                last_report_key = pathlib.Path(state_filepath).read_text()
+            except FileNotFoundError:
+                last_report_key = None
+            if report_key == last_report_key:
+                logger.info("Data files have not changed since last report")
+                exit(0)
+
+        # reading boot records is independent from decompressing data files, so overlap them
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as reboot_executor:
+            reboot_times_future = reboot_executor.submit(get_reboot_times)
+            sysstat_data.prepareFiles()
+            reboot_times = reboot_times_future.result()
+
+        if args.cache_dir is not None:
+            os.makedirs(args.cache_dir, exist_ok=True)
+
+        plotter = Plotter(report_type, reboot_times)
         graph_filepaths: Dict[GraphFormat, List[str]] = {
             GraphFormat.TXT: [],
             args.img_format: [],
         }
-        reboot_times = get_reboot_times()
-
-        for data_type in args.data_type:
-            # data
-            logging.getLogger().info(f"Extracting {data_type.name} data...")
-            data_filepath = os.path.join(temp_dir, f"{data_type.name.lower()}.csv")
-            indexes, data_filepaths = sysstat_data.generateDataToPlot(
-                data_type, data_filepath
-            )
-            if not data_filepaths:
-                data_filepaths = {"": data_filepath}
 
-            # plot graph
-            for graph_format in (GraphFormat.TXT, args.img_format):
-                logging.getLogger().info(
-                    f"Generating {data_type.name} {graph_format.name} report..."
-                )
-                graph_filepaths[graph_format].append(
-                    os.path.join(
-                        temp_dir,
-                        f"{data_type.name.lower()}.{graph_format.name.lower()}",
+        process = functools.partial(
+            process_data_type,
+            sysstat_data=sysstat_data,
+            plotter=plotter,
+            img_format=args.img_format,
+            img_size=args.img_size,
+            temp_dir=temp_dir,
+            cache_dir=args.cache_dir,
+            text_graph=not args.no_text,
+            crunch_min_size=args.crunch_min_size,
+            # data types are processed in parallel, share CPUs between them
+            sadf_workers=max(1, (os.cpu_count() or 1) // len(args.data_type)),
+        )
+        results: Iterable[Dict[GraphFormat, str]]
+        with contextlib.ExitStack() as cm:
+            if len(args.data_type) > 1:
+                # data types are independent, so process them in parallel
+                pool_kwargs: Dict[str, Any] = {}
+                if sys.version_info >= (3, 7):
+                    # workers need to inherit logging setup, fork is not the default start method since Python 3.14
+                    pool_kwargs["mp_context"] = multiprocessing.get_context("fork")
+                executor = cm.enter_context(
+                    concurrent.futures.ProcessPoolExecutor(
+                        max_workers=min(len(args.data_type), os.cpu_count() or 1),
+                        **pool_kwargs,
                     )
                 )
-                plotter.plot(
-                    graph_format,
-                    args.img_size,
-                    data_filepaths,
-                    indexes,
-                    data_type,
-                    reboot_times,
-                    graph_filepaths[graph_format][-1],
-                    report_type is not ReportType.DAILY,
-                    **Plotter.PLOT_ARGS[data_type],
-                )
+                results = executor.map(process, args.data_type)
+            else:
+                # not worth spawning a worker process (not a lazy map, a leaked StopIteration would end the loop silently)
+                results = [process(data_type) for data_type in args.data_type]
+            for data_type_graph_filepaths in results:
+                for graph_format, graph_filepath in data_type_graph_filepaths.items():
+                    graph_filepaths[graph_format].append(graph_filepath)
+
+        if args.cache_dir is not None:
+            evict_graph_cache(args.cache_dir, GRAPH_CACHE_MAX_SIZE)
 
         # send mail
-        logging.getLogger().info("Formatting email...")
-        email_data = format_email(
+        logger.info("Formatting email...")
+        msg = format_email(
             args.mail_from,
             args.mail_to,
             f"Sysstat {report_type.name.lower()} report",
@@ -895,11 +1432,38 @@ if __name__ == "__main__":
             graph_filepaths[GraphFormat.TXT],
         )
 
-        real_mail_from = email.utils.parseaddr(args.mail_from)[1]
-        real_mail_to = email.utils.parseaddr(args.mail_to)[1]
-        logging.getLogger().info(
-            f"Sending email from {real_mail_from!r} to {real_mail_to!r}..."
+        real_mail_from = args.mail_from[1]
+        real_mail_to = [mail_to[1] for mail_to in args.mail_to]
+        logger.info(
+            "Sending email from %r to %s...",
+            real_mail_from,
+            ", ".join(map(repr, real_mail_to)),
         )
-        cmd = ("sendmail", "-f", real_mail_from, real_mail_to)
-        logging.getLogger().debug(cmd_to_string(cmd))
-        subprocess.run(cmd, input=email_data, universal_newlines=True, check=True)
+        if args.smtp_host is not None:
+            # submit directly to the MTA, without going through a sendmail process
+            with smtplib.SMTP(args.smtp_host) as smtp:
+                smtp.send_message(msg, real_mail_from, real_mail_to)
+
+        else:
+            # a single sendmail process for all recipients
+            cmd = ("sendmail", "-f", real_mail_from, *real_mail_to)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(cmd_to_string(cmd))
+            with subprocess.Popen(
+                cmd, stdin=subprocess.PIPE, close_fds=False
+            ) as sendmail_proc:
+                assert sendmail_proc.stdin is not None
+                # write message directly to the pipe, without building the whole email string first
+                email.generator.BytesGenerator(
+                    sendmail_proc.stdin, mangle_from_=False, maxheaderlen=0
+                ).flatten(msg)
+                sendmail_proc.stdin.close()
+            if sendmail_proc.returncode != 0:
+                raise subprocess.CalledProcessError(sendmail_proc.returncode, cmd)
+
+        if args.skip_unchanged:
+            try:
+                os.makedirs(state_dir, exist_ok=True)
+                pathlib.Path(state_filepath).write_text(report_key)
+            except OSError as e:
+                logger.warning("Unable to store report key: %s", e)